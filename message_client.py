@@ -2,6 +2,7 @@ import discord, logging, re, json, os, asyncio
 from yaml import load, Loader
 from discord.http import HTTPException
 from datetime import datetime, timedelta
+from profiler import setup_profiler
 
 # Configuración del logging
 # Crear un logger
@@ -32,6 +33,8 @@ MESSAGE_INTERVAL = settings["client"]['message_interval']
 COPIED_MESSAGES_FILE = "copied_messages.json"
 PENDING_MESSAGES_FILE = "pending_messages.json"
 MEMBERS_FILE = "members.json"
+HISTORY_PAGE_SIZE = 100  # Máximo de mensajes por petición de historial
+profiler = setup_profiler(settings, "message_client")
 
 # Inicializar los archivos de mensajes copiados y pendientes si no existen
 for file in [COPIED_MESSAGES_FILE, PENDING_MESSAGES_FILE, MEMBERS_FILE]:
@@ -83,83 +86,102 @@ def save_members(members):
     with open(MEMBERS_FILE, 'w') as f:
         json.dump(members_data, f, indent=4)
 
+def build_message_data(message):
+    # Obtener los archivos adjuntos (imágenes, etc.)
+    attachments = [attachment.url for attachment in message.attachments]
+
+    # Obtener los embeds del mensaje
+    embeds = []
+    for embed in message.embeds:
+        embeds.append({
+            'title': embed.title,
+            'description': embed.description,
+            'url': embed.url,
+            'color': embed.color,
+            'timestamp': embed.timestamp.isoformat(),
+            'footer': {
+                'text': embed.footer.text,
+                'icon_url': embed.footer.icon_url
+            },
+            'image': {
+                'url': embed.image.url
+            },
+            'thumbnail': {
+                'url': embed.thumbnail.url
+            },
+            'author': {
+                'name': embed.author.name,
+                'url': embed.author.url,
+                'icon_url': embed.author.icon_url
+            },
+            'fields': [
+                {
+                    'name': field.name,
+                    'value': field.value,
+                    'inline': field.inline
+                } for field in embed.fields
+            ]
+        })
+
+    # Construir los datos del mensaje
+    message_data = {
+        'id': message.id,
+        'content': message.content,
+        'channel_id': message.channel.id,
+        'channel_name': message.channel.name,
+        'author_name': message.author.name,
+        'author_id': message.author.id,
+        'author_avatar_url': str(message.author.avatar_url),
+        'timestamp': message.created_at.isoformat(),
+        'attachments': attachments,
+        'embeds': embeds,  # Añadir embeds
+        'videos': [
+            attachment.url for attachment in message.attachments if attachment.url.endswith(('.mp4', '.mov', '.avi', '.mkv'))
+        ]  # Añadir videos
+    }
+    return message_data
+
 client = discord.Client()
 
 async def fetch_and_save_messages(channel):
     copied_messages = load_copied_messages()
 
     try:
-        async for message in channel.history(limit=None, oldest_first=True):
-            if message.id in copied_messages or message.channel.id in EXCLUDED_CHANNELS or REGEX_FILTER.search(message.content):
-                continue
-
-            # Obtener los archivos adjuntos (imágenes, etc.)
-            attachments = [attachment.url for attachment in message.attachments]
-
-            # Obtener los embeds del mensaje
-            embeds = []
-            for embed in message.embeds:
-                embeds.append({
-                    'title': embed.title,
-                    'description': embed.description,
-                    'url': embed.url,
-                    'color': embed.color,
-                    'timestamp': embed.timestamp.isoformat(),
-                    'footer': {
-                        'text': embed.footer.text,
-                        'icon_url': embed.footer.icon_url
-                    },
-                    'image': {
-                        'url': embed.image.url
-                    },
-                    'thumbnail': {
-                        'url': embed.thumbnail.url
-                    },
-                    'author': {
-                        'name': embed.author.name,
-                        'url': embed.author.url,
-                        'icon_url': embed.author.icon_url
-                    },
-                    'fields': [
-                        {
-                            'name': field.name,
-                            'value': field.value,
-                            'inline': field.inline
-                        } for field in embed.fields
-                    ]
-                })
-
-            # Guardar el mensaje en el archivo pendiente
-            message_data = {
-                'id': message.id,
-                'content': message.content,
-                'channel_id': message.channel.id,
-                'channel_name': message.channel.name,
-                'author_name': message.author.name,
-                'author_id': message.author.id,
-                'author_avatar_url': str(message.author.avatar_url),
-                'timestamp': message.created_at.isoformat(),
-                'attachments': attachments,
-                'embeds': embeds,  # Añadir embeds
-                'videos': [
-                    attachment.url for attachment in message.attachments if attachment.url.endswith(('.mp4', '.mov', '.avi', '.mkv'))
-                ]  # Añadir videos
-            }
-            save_pending_message(message_data)
-            save_copied_message(message.id)
-            await asyncio.sleep(MESSAGE_INTERVAL)
-
-            # Manejo de errores de tasa
-            try:
-                await asyncio.sleep(MESSAGE_INTERVAL)
-            except HTTPException as e:
-                if e.status == 429:
-                    retry_after = e.response.json().get('retry_after', 1) / 1000
-                    logging.warning(f"Rate limited. Retrying after {retry_after} seconds.")
-                    await asyncio.sleep(retry_after)
-                else:
-                    logging.error(f"HTTP error: {e}")
-                    raise
+        last_message = None
+        while True:
+            # Paginar el historial explícitamente para medir cada página
+            with profiler.span("fetch"):
+                messages = await channel.history(limit=HISTORY_PAGE_SIZE, after=last_message, oldest_first=True).flatten()
+            if not messages:
+                break
+            last_message = messages[-1]
+
+            for message in messages:
+                if message.id in copied_messages or message.channel.id in EXCLUDED_CHANNELS or REGEX_FILTER.search(message.content):
+                    continue
+
+                with profiler.span("build"):
+                    message_data = build_message_data(message)
+                # Guardar el mensaje en el archivo pendiente
+                with profiler.span("enqueue"):
+                    save_pending_message(message_data)
+                with profiler.span("persist"):
+                    save_copied_message(message.id)
+                with profiler.span("sleep"):
+                    await asyncio.sleep(MESSAGE_INTERVAL)
+
+                # Manejo de errores de tasa
+                try:
+                    with profiler.span("sleep"):
+                        await asyncio.sleep(MESSAGE_INTERVAL)
+                except HTTPException as e:
+                    if e.status == 429:
+                        retry_after = e.response.json().get('retry_after', 1) / 1000
+                        logging.warning(f"Rate limited. Retrying after {retry_after} seconds.")
+                        await asyncio.sleep(retry_after)
+                    else:
+                        logging.error(f"HTTP error: {e}")
+                        raise
 
     except discord.Forbidden:
         logging.warning(f"Permission denied for channel: {channel.name}")
@@ -171,13 +193,15 @@ async def fetch_and_save_messages(channel):
 async def update_members_periodically(guild):
     while True:
         members = guild.members  # Obtener los miembros desde la caché
-        save_members(members)
+        with profiler.span("persist"):
+            save_members(members)
         await asyncio.sleep(3600)  # Esperar 1 hora antes de actualizar nuevamente
 
 @client.event
 async def on_ready():
     logging.info(f"Logged in as {client.user.name}")
     server = client.get_guild(SERVER_ID)
+    profiler.start(client.loop)
     
     if server:
         # Iniciar actualización periódica de miembros
@@ -1,6 +1,7 @@
 import asyncio, discord, logging, json, os, datetime, aiohttp
 from yaml import load, Loader
 from discord.ext import commands
+from profiler import setup_profiler
 
 # Configuración del logging
 # Crear un logger
@@ -30,6 +31,7 @@ INTERVAL = settings["server"]['interval']
 COPIED_MESSAGES_FILE = "copied_messages.json"
 PENDING_MESSAGES_FILE = "pending_messages.json"
 SENT_MESSAGES_FILE = "sent_messages.json"
+profiler = setup_profiler(settings, "message_server")
 
 
 # Inicializar el bot
@@ -81,30 +83,33 @@ async def send_message_via_webhook(webhook_url, content, author_name, author_ava
 
         if attachments:
             for attachment in attachments:
-                async with session.get(attachment) as resp:
-                    if resp.status == 200:
-                        file_data = await resp.read()
-                        # Obtener el nombre del archivo desde la URL
-                        file_name = attachment.split("/")[-1].split("?")[0]
-                        # Añadir el archivo al formulario de datos
-                        form_data.add_field('file', file_data, filename=file_name, content_type=resp.headers['Content-Type'])
+                with profiler.span("download"):
+                    async with session.get(attachment) as resp:
+                        if resp.status == 200:
+                            file_data = await resp.read()
+                            # Obtener el nombre del archivo desde la URL
+                            file_name = attachment.split("/")[-1].split("?")[0]
+                            # Añadir el archivo al formulario de datos
+                            form_data.add_field('file', file_data, filename=file_name, content_type=resp.headers['Content-Type'])
 
         # Añadir videos al payload si es necesario
         if videos:
             payload["videos"] = [{"url": video} for video in videos]
 
         # Enviar la solicitud POST con el formulario de datos
-        async with session.post(webhook_url, data=form_data) as response:
-            if response.status == 204:
-                logging.info("Message sent successfully via webhook.")
-            else:
-                logging.error(f"Failed to send message via webhook: {response.status} - {await response.text()}")
+        with profiler.span("post"):
+            async with session.post(webhook_url, data=form_data) as response:
+                if response.status == 204:
+                    logging.info("Message sent successfully via webhook.")
+                else:
+                    logging.error(f"Failed to send message via webhook: {response.status} - {await response.text()}")
 
 
 async def process_pending_messages():
-    pending_messages = load_pending_messages()
-    sitemap = load_sitemap()
-    sent_messages = load_sent_messages()  # Cargar los mensajes enviados
+    with profiler.span("load"):
+        pending_messages = load_pending_messages()
+        sitemap = load_sitemap()
+        sent_messages = load_sent_messages()  # Cargar los mensajes enviados
 
 
     # Crear un diccionario para mapear IDs de canales originales a clonados
@@ -174,12 +179,14 @@ async def process_pending_messages():
                         logging.info(f"Message re-sent via webhook: {content}")
 
                         # Guardar el ID del mensaje como enviado
-                        save_sent_message(message_id)
+                        with profiler.span("persist"):
+                            save_sent_message(message_id)
                     else:
                         logging.warning(f"Message with ID {message_data['id']} has empty content.")
 
                     # Después de enviar el mensaje, elimina de la lista de pendientes
-                    remove_pending_message(message_id)
+                    with profiler.span("dequeue"):
+                        remove_pending_message(message_id)
                 except Exception as e:
                     logging.error(f"Failed to resend message {message_data['id']}: {e}")
             else:
@@ -187,13 +194,15 @@ async def process_pending_messages():
         else:
             logging.warning(f"Cloned channel not found for original channel ID {original_channel_id}")
 
-        await asyncio.sleep(INTERVAL)
+        with profiler.span("sleep"):
+            await asyncio.sleep(INTERVAL)
 
 
 @bot.event
 async def on_ready():
     logging.info(f"Logged in as {bot.user.name}")
     server = bot.get_guild(SERVER_ID)
+    profiler.start(bot.loop)
 
     if server:
         while True:
@@ -0,0 +1,213 @@
+import asyncio, atexit, json, logging, os, signal, sys, threading, time, traceback
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# Modo de perfilado opcional, se activa desde settings.yaml:
+#
+# profiling:
+#   enabled: true
+#   output: "profile-message_client.json"  # por defecto profile-<nombre>.json
+#   lag_interval: 0.5    # cada cuánto se mide el retraso de asyncio.sleep, solo para estadísticas (s)
+#   lag_threshold: 0.1   # bloqueo a partir del cual se marca una llamada bloqueante (s)
+#   sample_interval: 0.05  # cada cuánto se hace ping al event loop y se muestrea su pila (s)
+#   stack_depth: 12
+#
+# Etapas medidas:
+#   fetch     - petición de una página de historial de Discord (message_client)
+#   load      - lectura de los JSON locales (pendientes, enviados, sitemap)
+#   build     - construcción del diccionario de cada mensaje (message_client)
+#   enqueue   - reescritura de pending_messages.json al añadir un mensaje (incluye la serialización JSON)
+#   dequeue   - reescritura de pending_messages.json al quitar un mensaje enviado (message_server)
+#   persist   - reescritura del resto de JSON (copiados, enviados, miembros, sitemap)
+#   download  - descarga de adjuntos (message_server)
+#   post      - envío al webhook
+#   update    - sincronización completa de la estructura (structure_server)
+#   sleep     - esperas de pacing con asyncio.sleep
+#
+# El perfil se guarda al salir (atexit) y al recibir SIGUSR1 (sin detener el proceso).
+# Con SIGTERM, discord.py detiene el event loop y el perfil se guarda por atexit.
+
+MAX_STAGE_SAMPLES = 1000
+MAX_LAG_EVENTS = 50
+
+
+class Profiler:
+    def __init__(self, name, config=None):
+        config = config or {}
+        self.name = name
+        self.enabled = bool(config.get('enabled', False))
+        self.output = config.get('output', f"profile-{name}.json")
+        self.lag_interval = config.get('lag_interval', 0.5)
+        self.lag_threshold = config.get('lag_threshold', 0.1)
+        self.sample_interval = config.get('sample_interval', 0.05)
+        self.stack_depth = config.get('stack_depth', 12)
+
+        self._lock = threading.RLock()
+        self._stages = {}
+        self._lags = deque(maxlen=MAX_STAGE_SAMPLES)
+        self._lag_events = deque(maxlen=MAX_LAG_EVENTS)
+        self._stack_samples = Counter()
+        self._started_at = time.time()
+        self._loop = None
+        self._loop_thread_id = None
+        self._ping_sent = None
+        self._ping_answered = None
+        self._stall = None
+        self._stall_since = None
+        self._running = False
+
+        if self.enabled:
+            atexit.register(self.dump)
+            logging.info(f"Profiling enabled, profile will be written to {self.output}")
+
+    def record(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = {'count': 0, 'total': 0.0, 'max': 0.0, 'samples': deque(maxlen=MAX_STAGE_SAMPLES)}
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            stats['samples'].append(seconds)
+
+    @contextmanager
+    def span(self, stage):
+        # Mide el tiempo real de una etapa, incluyendo los awaits dentro del bloque
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def start(self, loop=None):
+        # Debe llamarse desde el hilo del event loop (por ejemplo en on_ready)
+        if not self.enabled or self._running:
+            return
+        self._running = True
+        self._loop = loop or asyncio.get_event_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._loop.create_task(self._monitor_lag())
+        # Igual que discord.py con SIGINT/SIGTERM: el volcado se ejecuta como callback del loop
+        if hasattr(signal, 'SIGUSR1'):
+            try:
+                self._loop.add_signal_handler(signal.SIGUSR1, self.dump)
+            except (NotImplementedError, RuntimeError):
+                logging.warning("SIGUSR1 profile dumps are not supported on this platform.")
+        threading.Thread(target=self._watchdog, name=f"profiler-{self.name}", daemon=True).start()
+        logging.info("Event loop lag monitor started.")
+
+    async def _monitor_lag(self):
+        # Solo estadísticas de retraso; los bloqueos los detecta y registra _watchdog
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(self.lag_interval)
+            lag = max(0.0, time.perf_counter() - before - self.lag_interval)
+            with self._lock:
+                self._lags.append(lag)
+
+    def _loop_stack(self):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        summary = traceback.extract_stack(frame)[-self.stack_depth:]
+        return ";".join(f"{os.path.basename(f.filename)}:{f.lineno}:{f.name}" for f in summary)
+
+    def _ping(self):
+        self._ping_answered = time.perf_counter()
+        self._ping_sent = None
+
+    def _watchdog(self):
+        # Hilo aparte: hace ping al event loop cada sample_interval y muestrea su pila.
+        # Si el loop no responde al ping en lag_threshold, hay una llamada bloqueante.
+        while self._running:
+            time.sleep(self.sample_interval)
+            # Tiempo que lleva sin responder el ping pendiente (0 si ya respondió)
+            sent_at = self._ping_sent
+            stalled_for = time.perf_counter() - sent_at if sent_at is not None else 0.0
+            stack = self._loop_stack()
+            with self._lock:
+                if stack is not None:
+                    self._stack_samples[stack] += 1
+                if stalled_for > self.lag_threshold:
+                    if self._stall is None:
+                        # Se guarda la pila del primer aviso, que es la de la llamada bloqueante
+                        self._stall_since = sent_at
+                        self._stall = {'time': time.time() - stalled_for, 'stalled_for': stalled_for, 'stack': stack.split(";") if stack else []}
+                        self._lag_events.append(self._stall)
+                        logging.info(f"Event loop blocked for more than {self.lag_threshold}s in: {stack.split(';')[-1] if stack else 'unknown'}")
+                    else:
+                        self._stall['stalled_for'] = stalled_for
+                elif self._stall is not None:
+                    # El loop ha vuelto a responder: duración real del bloqueo
+                    self._stall['stalled_for'] = self._ping_answered - self._stall_since
+                    logging.warning(f"Event loop was blocked for {self._stall['stalled_for']:.3f}s")
+                    self._stall = None
+            if self._ping_sent is not None:
+                continue
+            try:
+                self._ping_sent = time.perf_counter()
+                self._loop.call_soon_threadsafe(self._ping)
+            except RuntimeError:
+                # El event loop se ha cerrado
+                self._running = False
+
+    def report(self):
+        with self._lock:
+            stages = {}
+            for stage, stats in self._stages.items():
+                samples = sorted(stats['samples'])
+                stages[stage] = {
+                    'count': stats['count'],
+                    'total': stats['total'],
+                    'mean': stats['total'] / stats['count'] if stats['count'] else 0.0,
+                    'max': stats['max'],
+                    'p50': _percentile(samples, 0.50),
+                    'p95': _percentile(samples, 0.95),
+                }
+            lags = sorted(self._lags)
+            return {
+                'name': self.name,
+                'started_at': self._started_at,
+                'dumped_at': time.time(),
+                'stages': stages,
+                'event_loop_lag': {
+                    'interval': self.lag_interval,
+                    'threshold': self.lag_threshold,
+                    'count': len(lags),
+                    'max': lags[-1] if lags else 0.0,
+                    'p50': _percentile(lags, 0.50),
+                    'p95': _percentile(lags, 0.95),
+                    'blocking_events': list(self._lag_events),
+                },
+                'stack_samples': {
+                    'interval': self.sample_interval,
+                    'total': sum(self._stack_samples.values()),
+                    'stacks': dict(self._stack_samples.most_common()),
+                },
+            }
+
+    def dump(self):
+        if not self.enabled:
+            return
+        try:
+            with open(self.output, 'w') as f:
+                json.dump(self.report(), f, indent=4)
+            logging.info(f"Profile saved to {self.output}")
+        except Exception as e:
+            logging.error(f"Failed to save profile to {self.output}: {e}")
+
+
+def _percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def setup_profiler(settings, name):
+    return Profiler(name, settings.get('profiling'))
@@ -4,6 +4,7 @@ from yaml import load, Loader
 from json import load as j_load, dump as j_dump, loads
 from resilient_caller import resilient_call, update_session_proxy 
 from random import choice
+from profiler import setup_profiler
 
 # Define logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,6 +20,7 @@ INTERVAL = settings["server"]['interval']
 WEBHOOK_NAME = settings["server"]['webhook_name']
 PORT, HOST = list(settings['server']['websocket'].values())
 PROXIES = open("proxies.txt", "r").read().splitlines()
+profiler = setup_profiler(settings, "structure_server")
 bot = commands.Bot(command_prefix='>', self_bot=True)
 
 @resilient_call()
@@ -29,14 +31,16 @@ async def send_webhook_to_discord(webhook_url: str, webhook_data: dict):
         if len(PROXIES) > 0:
             update_session_proxy(session, choice(PROXIES))
             logging.info(f"Using proxy for webhook: {choice(PROXIES)}")
-        async with session.post(webhook_url, json=webhook_data) as response:
-            result = await response.text()
-            logging.info(f"Webhook response: {response.status} - {result}")
-            return result
+        with profiler.span("post"):
+            async with session.post(webhook_url, json=webhook_data) as response:
+                result = await response.text()
+                logging.info(f"Webhook response: {response.status} - {result}")
+                return result
 
 @bot.event
 async def on_ready():
     logging.info(f"Logged in as {bot.user.name} ({bot.user.id})")
+    profiler.start(bot.loop)
 
 async def update_server_structure(sitemap: dict, sitemap_file: str):
     server = bot.get_guild(SERVER_ID)
@@ -44,7 +48,7 @@ async def update_server_structure(sitemap: dict, sitemap_file: str):
         logging.error("Failed to find the server. Check SERVER_ID in settings.{SERVER_ID}")
         return
     try:
-        with open(sitemap_file, "r") as infile:
+        with open(sitemap_file, "r") as infile, profiler.span("load"):
             updated_sitemap = j_load(infile)
     except FileNotFoundError:
         logging.warning(f"{sitemap_file} not found, creating a new one.")
@@ -64,7 +68,8 @@ async def update_server_structure(sitemap: dict, sitemap_file: str):
             if category is None:
                 category = await server.create_category(cat_data["name"])
                 logging.info(f"Category created: {cat_data['name']}")
-            await asyncio.sleep(INTERVAL)
+            with profiler.span("sleep"):
+                await asyncio.sleep(INTERVAL)
             
             updated_channels = []
             
@@ -79,7 +84,8 @@ async def update_server_structure(sitemap: dict, sitemap_file: str):
                     webhook = await channel.create_webhook(name=WEBHOOK_NAME)
                     updated_channels.append({"name": channel.name, "original_id": channel_data["original_id"], "cloned_id": channel.id, "webhook": webhook.url})
                     logging.info(f"Channel created: {channel_data['name']} in category {cat_data['name']}")
-                    await asyncio.sleep(INTERVAL)
+                    with profiler.span("sleep"):
+                        await asyncio.sleep(INTERVAL)
                 else:
                     webhook = None
                     webhooks = await channel.webhooks()
@@ -91,7 +97,8 @@ async def update_server_structure(sitemap: dict, sitemap_file: str):
                         webhook = await channel.create_webhook(name=WEBHOOK_NAME)
                     updated_channels.append({"name": channel.name, "original_id": channel_data["original_id"],"cloned_id": channel.id, "webhook": webhook.url})
                     logging.debug(f"Channel already exists: {channel_data['name']} in category {cat_data['name']}")
-                await asyncio.sleep(INTERVAL)
+                with profiler.span("sleep"):
+                    await asyncio.sleep(INTERVAL)
             
             updated_sitemap["categories"].append({"name": category.name, "channels": updated_channels})
         else:
@@ -114,7 +121,8 @@ async def update_server_structure(sitemap: dict, sitemap_file: str):
                 webhook = await channel.create_webhook(name=WEBHOOK_NAME)
                 updated_sitemap["standalone_channels"].append({"name": channel.name, "original_id": channel_data["original_id"], "cloned_id": channel.id, "webhook": webhook.url})
                 logging.info(f"Standalone channel created: {channel_data['name']}")
-                await asyncio.sleep(INTERVAL)
+                with profiler.span("sleep"):
+                    await asyncio.sleep(INTERVAL)
             else:
                 webhook = None
                 webhooks = await channel.webhooks()
@@ -130,13 +138,14 @@ async def update_server_structure(sitemap: dict, sitemap_file: str):
             logging.debug(f"Standalone channel already exists in the sitemap: {channel_data['name']}")
 
         await save_sitemap_to_file(updated_sitemap, sitemap_file)
-        await asyncio.sleep(INTERVAL)
+        with profiler.span("sleep"):
+            await asyncio.sleep(INTERVAL)
     logging.info("Server structure updated.")
     return updated_sitemap
 
 async def save_sitemap_to_file(sitemap, filename="final.json"):
     logging.info(f"Saving sitemap to {filename}")
-    with open(filename, "w") as outfile:
+    with profiler.span("persist"), open(filename, "w") as outfile:
         j_dump(sitemap, outfile, indent=4)
     logging.info(f"Sitemap saved successfully to {filename}")
 
@@ -185,7 +194,8 @@ async def websocket_handler(websocket, path):
         data = loads(message)
         if data["type"] == "sitemap":
             logging.info("Sitemap received")
-            updated_sitemap = await update_server_structure(data["data"], sitemap_file)
+            with profiler.span("update"):
+                updated_sitemap = await update_server_structure(data["data"], sitemap_file)
             if updated_sitemap is not None:
                 await save_sitemap_to_file(updated_sitemap, sitemap_file)
 